@@ -1,20 +1,71 @@
 """
 GeminiOps Bridge Agent Definition
 
-This module defines the three-agent sequential pipeline:
+This module defines the three-agent pipeline:
 1. Datadog Investigation Agent - Makes ONE log search to minimize API calls
 2. Decision Making Agent - Pure reasoning, evaluates severity (no tools)
 3. Azure DevOps Ticket Agent - Creates incidents if needed
 
+Steps 2 and 3 normally run without Gemini: decisions come from rules.py
+and work items are rendered by tickets.py and created through the ADO
+MCP session directly. The agents are the fallback for reports or
+decisions that cannot be parsed.
+
+While the investigation runs, the Azure DevOps MCP session is primed in
+parallel so the ticket agent does not pay the npx cold start afterwards.
+MCP server subprocesses are pooled for the lifetime of the process rather
+than spawned per alert (see McpSessionPool).
+
 CRITICAL: Agents are defined synchronously at module level for deployment.
 NOTE: Instructions are optimized to minimize Gemini API calls to stay within rate limits.
 """
 
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
 import os
-from google.adk.agents import LlmAgent, SequentialAgent
-from google.adk.tools.mcp_tool import McpToolset
-from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
-from mcp import StdioServerParameters
+import shutil
+from dataclasses import dataclass, field
+from functools import partial
+from datetime import timedelta
+from typing import AsyncGenerator, Collection, Optional
+
+from aiolimiter import AsyncLimiter
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.events import Event, EventActions
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.tools import BaseTool, ToolContext
+from google.adk.tools.mcp_tool import McpTool, McpToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import (
+    MCPSessionManager,
+    StdioConnectionParams,
+)
+from google.genai import types
+from mcp import ClientSession, StdioServerParameters, Tool
+from mcp.types import (
+    CallToolResult,
+    Implementation,
+    ServerNotification,
+    ToolListChangedNotification,
+)
+from mcp.client.stdio import stdio_client
+
+from caches import MemoryCache
+from reports import (
+    decision_action,
+    digest_search_logs,
+    parse_decision,
+    parse_investigation_report,
+    patch_report_fields,
+    reports_no_errors,
+)
+from rules import decide
+from tickets import render_ticket
 
 # Environment variables (loaded by FastAPI from .env via python-dotenv)
 DD_API_KEY = os.getenv("DD_API_KEY")
@@ -23,6 +74,24 @@ DD_SITE = os.getenv("DD_SITE", "datadoghq.com")
 ADO_ORG_NAME = os.getenv("ADO_ORG_NAME")
 ADO_PAT = os.getenv("ADO_PAT")
 
+# Upper bound on concurrent ADO prefetches across a burst of webhooks
+MAX_PARALLEL = int(os.getenv("MAX_PARALLEL", "4"))
+
+# Investigation summary cache (recurring log signatures reuse the summary)
+SUMMARY_CACHE_MB = int(os.getenv("SUMMARY_CACHE_MB", "100"))
+
+# Gemini request rate, across all alerts. An alert normally makes two calls
+# (the search_logs function call and the investigation summary); the
+# decision and ticket fallbacks add up to three more.
+GEMINI_CALLS_PER_MINUTE = int(os.getenv("GEMINI_CALLS_PER_MINUTE", "10"))
+
+# MCP tool manifests persisted across restarts (see McpSessionPool)
+MCP_TOOLS_CACHE_DIR = os.path.expanduser(
+    os.getenv("MCP_TOOLS_CACHE_DIR", "~/.cache/geminiops")
+)
+
+logger = logging.getLogger(__name__)
+
 # Validate required environment variables
 if not all([DD_API_KEY, DD_APP_KEY, ADO_ORG_NAME, ADO_PAT]):
     raise ValueError(
@@ -30,6 +99,532 @@ if not all([DD_API_KEY, DD_APP_KEY, ADO_ORG_NAME, ADO_PAT]):
         "Ensure DD_API_KEY, DD_APP_KEY, ADO_ORG_NAME, and ADO_PAT are set."
     )
 
+# --- MCP Session Pool ---
+def compute_mcp_config_hash(server: StdioServerParameters) -> str:
+    """
+    Hash an MCP server config into a pool key.
+
+    command and args are order-sensitive; env is hashed order-independently,
+    so toolsets built from equal env dicts share one server process. cwd
+    and the stdio encoding are part of the key too: relative paths in args
+    (../datadog-mcp/...) resolve against cwd.
+    """
+    env = server.env or {}
+    material = (
+        server.command
+        + "\0"
+        + "\0".join(server.args)
+        + "\0"
+        + json.dumps(sorted(env.items()))
+        + "\0"
+        + str(server.cwd or "")
+        + "\0"
+        + server.encoding
+        + "\0"
+        + server.encoding_error_handler
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _entry_point_stamp(server: StdioServerParameters) -> str:
+    """
+    Size and mtime of the files a server config runs: the resolved
+    command and any args that name an existing file (dist/index.js).
+    Rebuilding the server changes the stamp even when the version it
+    reports on initialize stays the same.
+    """
+    cwd = str(server.cwd or os.getcwd())
+    paths = [shutil.which(server.command, path=(server.env or {}).get("PATH"))]
+    paths += [os.path.join(cwd, arg) for arg in server.args]
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except (TypeError, OSError):
+            continue
+        if os.path.isfile(path):
+            stamps.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "\0".join(stamps)
+
+
+@dataclass
+class _ToolManifest:
+    """tools/list results for one pooled session, possibly partial."""
+
+    tools: dict[str, Tool] = field(default_factory=dict)
+    cursor: Optional[str] = None
+    complete: bool = False
+
+
+class McpSessionPool:
+    """
+    Process-wide pool of MCP stdio sessions.
+
+    Toolsets register their connection params and get back a key
+    (compute_mcp_config_hash). Each key is spawned and initialized once,
+    then the same ClientSession is shared by every toolset and every alert
+    until disconnect() or shutdown().
+
+    When several toolsets share a key, the most restrictive setting wins:
+    the session is opened with the smallest registered timeout.
+
+    Tool manifests are fetched once per session (list_tools) and reused
+    by every get_tools() call until the session is closed. Complete
+    manifests are also written to cache_dir, keyed by server config, the
+    size and mtime of its entry point files and the name/version the
+    server reports on initialize, so a restart skips tools/list too. A tools/list_changed notification from the server
+    drops both copies.
+    """
+
+    def __init__(self, cache_dir: str = MCP_TOOLS_CACHE_DIR):
+        self._cache_dir = cache_dir
+        self._manifest_paths: dict[str, str] = {}
+        self._params: dict[str, StdioConnectionParams] = {}
+        self._sessions: dict[
+            str, tuple[ClientSession, asyncio.Event, asyncio.Task]
+        ] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._manifests: dict[str, _ToolManifest] = {}
+        self._private_ids = itertools.count()
+
+    def register(
+        self, params: StdioConnectionParams, no_share: bool = False
+    ) -> str:
+        """
+        Register a server config and return its pool key.
+
+        no_share=True gives the caller a private session, for servers that
+        keep per-client state and must not be shared.
+        """
+        key = compute_mcp_config_hash(params.server_params)
+        if no_share:
+            key = f"{key}:{next(self._private_ids)}"
+
+        registered = self._params.get(key)
+        if registered is None or params.timeout < registered.timeout:
+            self._params[key] = params
+        return key
+
+    @staticmethod
+    def _is_disconnected(session: ClientSession) -> bool:
+        # Same check ADK's MCPSessionManager uses for its own sessions
+        return session._read_stream._closed or session._write_stream._closed
+
+    async def connect(self, key: str) -> ClientSession:
+        """Return the pooled session for key, spawning it on first use."""
+        # One lock per server config: concurrent first calls share one spawn
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                if not self._is_disconnected(entry[0]):
+                    return entry[0]
+                logger.info(
+                    "Reconnecting disconnected MCP session: %s",
+                    self._params[key].server_params.command,
+                )
+                await self._close(key)
+
+            ready = asyncio.get_running_loop().create_future()
+            stop = asyncio.Event()
+            owner = asyncio.create_task(self._serve(key, ready, stop))
+            try:
+                session = await ready
+            except BaseException:
+                stop.set()
+                owner.cancel()
+                raise
+
+            self._sessions[key] = (session, stop, owner)
+            return session
+
+    async def connect_all(self) -> None:
+        """Spawn every registered server. Failures are logged, not raised."""
+        keys = list(self._params)
+        results = await asyncio.gather(
+            *(self.connect(key) for key in keys), return_exceptions=True
+        )
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    "MCP warmup failed for %s: %s",
+                    self._params[key].server_params.command,
+                    result,
+                )
+
+    async def list_tools(
+        self, key: str, names: Optional[Collection[str]] = None
+    ) -> list[Tool]:
+        """
+        Return the tools of key's server, from the cached manifest when
+        possible. With names, only those tools are returned and paging
+        through tools/list stops as soon as all of them have been seen.
+        """
+        session = await self.connect(key)
+        manifest = self._manifests.get(key)
+        if manifest is None:
+            manifest = await asyncio.to_thread(self._load_manifest, key)
+            self._manifests[key] = manifest
+            # ClientSession.call_tool runs tools/list itself for tools it has
+            # not listed yet (to validate outputSchema); seed that cache too
+            for tool in manifest.tools.values():
+                session._tool_output_schemas.setdefault(
+                    tool.name, tool.outputSchema
+                )
+        wanted = set(names) if names is not None else None
+
+        while not manifest.complete and (
+            wanted is None or not wanted <= manifest.tools.keys()
+        ):
+            result = await session.list_tools(cursor=manifest.cursor)
+            manifest.tools.update((tool.name, tool) for tool in result.tools)
+            manifest.cursor = result.nextCursor
+            manifest.complete = result.nextCursor is None
+            if manifest.complete:
+                await asyncio.to_thread(self._save_manifest, key, manifest)
+
+        return [
+            tool
+            for name, tool in manifest.tools.items()
+            if wanted is None or name in wanted
+        ]
+
+    async def list_tools_all(self) -> None:
+        """Fetch the manifest of every connected session (startup warmup)."""
+        results = await asyncio.gather(
+            *(self.list_tools(key) for key in list(self._sessions)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("MCP list_tools warmup failed: %s", result)
+
+    async def disconnect(self, key: str) -> None:
+        """Close the pooled session (and subprocess) for key, if any."""
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            await self._close(key)
+
+    async def shutdown(self) -> None:
+        """Close every pooled session. Called on application shutdown."""
+        await asyncio.gather(
+            *(self.disconnect(key) for key in list(self._sessions))
+        )
+
+    async def _serve(
+        self, key: str, ready: asyncio.Future, stop: asyncio.Event
+    ) -> None:
+        """
+        Own one server's stdio_client/ClientSession contexts for its whole
+        life. anyio requires them to be exited by the task that entered
+        them, so they cannot live in whichever request task connected first.
+        """
+        params = self._params[key]
+        try:
+            async with stdio_client(params.server_params) as (read, write):
+                async with ClientSession(
+                    read,
+                    write,
+                    read_timeout_seconds=timedelta(seconds=params.timeout),
+                    message_handler=partial(self._on_message, key),
+                ) as session:
+                    init = await session.initialize()
+                    self._manifest_paths[key] = self._manifest_path(
+                        key, init.serverInfo
+                    )
+                    ready.set_result(session)
+                    await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(
+                    "MCP session %s ended: %s", params.server_params.command, e
+                )
+
+    async def _on_message(self, key: str, message) -> None:
+        if isinstance(message, ServerNotification) and isinstance(
+            message.root, ToolListChangedNotification
+        ):
+            logger.info(
+                "MCP tools changed, dropping cached manifest: %s",
+                self._params[key].server_params.command,
+            )
+            self._manifests.pop(key, None)
+            path = self._manifest_paths.get(key)
+            if path:
+                await asyncio.to_thread(_remove_file, path)
+
+    # --- On-disk manifests ---
+    def _manifest_path(self, key: str, server_info: Implementation) -> str:
+        # Private (no_share) keys share their config's manifest
+        material = "\0".join([
+            key.split(":")[0],
+            _entry_point_stamp(self._params[key].server_params),
+            server_info.name,
+            server_info.version,
+        ])
+        digest = hashlib.sha256(material.encode()).hexdigest()[:32]
+        return os.path.join(self._cache_dir, f"tools_{digest}.json")
+
+    def _load_manifest(self, key: str) -> _ToolManifest:
+        path = self._manifest_paths.get(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                tools = [Tool.model_validate(tool) for tool in json.load(f)]
+        except (TypeError, OSError, ValueError):
+            # No path (not connected), no file yet, or an unreadable one
+            return _ToolManifest()
+        return _ToolManifest(
+            tools={tool.name: tool for tool in tools}, complete=True
+        )
+
+    def _save_manifest(self, key: str, manifest: _ToolManifest) -> None:
+        path = self._manifest_paths.get(key)
+        if not path:
+            return
+        tools = [
+            tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+            for tool in manifest.tools.values()
+        ]
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            # Write-then-rename so concurrent workers never read a partial file
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(tools, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not cache MCP tool manifest %s: %s", path, e)
+
+    async def _close(self, key: str) -> None:
+        self._manifests.pop(key, None)
+        entry = self._sessions.pop(key, None)
+        if entry is None:
+            return
+        _, stop, owner = entry
+        stop.set()
+        await owner
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+mcp_pool = McpSessionPool()
+
+
+class _PooledSessionManager(MCPSessionManager):
+    """MCPSessionManager that borrows its session from McpSessionPool."""
+
+    def __init__(
+        self,
+        pool: McpSessionPool,
+        connection_params: StdioConnectionParams,
+        no_share: bool = False,
+    ):
+        super().__init__(connection_params=connection_params)
+        self._pool = pool
+        self._pool_key = pool.register(connection_params, no_share=no_share)
+
+    async def create_session(
+        self, headers: Optional[dict[str, str]] = None
+    ) -> ClientSession:
+        return await self._pool.connect(self._pool_key)
+
+    async def list_tools(
+        self, names: Optional[Collection[str]] = None
+    ) -> list[Tool]:
+        return await self._pool.list_tools(self._pool_key, names)
+
+    async def close(self) -> None:
+        # The pool owns the session lifetime (see McpSessionPool.shutdown)
+        pass
+
+
+class PooledMcpToolset(McpToolset):
+    """
+    McpToolset whose stdio session is shared through McpSessionPool.
+
+    Pass no_share=True for stateful servers that need their own process.
+    """
+
+    def __init__(
+        self,
+        *,
+        connection_params: StdioConnectionParams,
+        pool: McpSessionPool = mcp_pool,
+        no_share: bool = False,
+        **kwargs,
+    ):
+        super().__init__(connection_params=connection_params, **kwargs)
+        self._mcp_session_manager = _PooledSessionManager(
+            pool, connection_params, no_share=no_share
+        )
+
+    async def get_tools(
+        self, readonly_context: Optional[ReadonlyContext] = None
+    ) -> list[BaseTool]:
+        """
+        Like McpToolset.get_tools, but served from the pool's cached
+        manifest. LlmAgent calls this on every model step, so without the
+        cache each step would cost a tools/list round trip.
+        """
+        # A name list lets the pool stop paging once those tools are found
+        names = self.tool_filter if isinstance(self.tool_filter, list) else None
+        tools = [
+            McpTool(
+                mcp_tool=tool,
+                mcp_session_manager=self._mcp_session_manager,
+                auth_scheme=self._auth_scheme,
+                auth_credential=self._auth_credential,
+            )
+            for tool in await self._mcp_session_manager.list_tools(names)
+        ]
+        return [
+            tool for tool in tools if self._is_tool_selected(tool, readonly_context)
+        ]
+
+    async def call_tool(self, name: str, arguments: dict) -> CallToolResult:
+        """Call a tool on the pooled session directly, without an agent."""
+        session = await self._mcp_session_manager.create_session()
+        return await session.call_tool(name, arguments)
+
+
+# --- MCP Toolsets ---
+# Defined once at module level so the orchestrator can reach the same
+# sessions the agents use (e.g. to prime the ADO session ahead of time).
+datadog_toolset = PooledMcpToolset(
+    connection_params=StdioConnectionParams(
+        server_params=StdioServerParameters(
+            command="node",
+            args=["../datadog-mcp/dist/index.js"],
+            env={
+                "DD_API_KEY": DD_API_KEY,
+                "DD_APP_KEY": DD_APP_KEY,
+                "DD_SITE": DD_SITE,
+                "PATH": os.getenv("PATH")
+            }
+        ),
+        timeout=30
+    ),
+    tool_filter=['search_logs']
+)
+
+ado_toolset = PooledMcpToolset(
+    connection_params=StdioConnectionParams(
+        server_params=StdioServerParameters(
+            command="npx",
+            args=[
+                # Reuse the npm cache instead of re-resolving the package
+                "--prefer-offline",
+                "-y",
+                "@azure-devops/mcp",
+                ADO_ORG_NAME,
+                "--authentication",
+                "envvar",
+                "-d", "core", "work-items"
+            ],
+            env={
+                "ADO_PAT": ADO_PAT,
+                "ADO_MCP_AUTH_TOKEN": ADO_PAT,
+                "AZURE_DEVOPS_ORG_URL": f"https://dev.azure.com/{ADO_ORG_NAME}",
+                "AZURE_DEVOPS_AUTH_METHOD": "pat",
+                "AZURE_DEVOPS_PAT": ADO_PAT,
+                "AZURE_DEVOPS_DEFAULT_PROJECT": os.getenv("ADO_PROJECT", "nyaya"),
+                "PATH": os.getenv("PATH")
+            }
+        ),
+        timeout=30
+    ),
+    tool_filter=['wit_create_work_item', 'wit_update_work_item']
+)
+
+# --- Investigation Summary Cache ---
+# search_logs results are unique per timestamp, but recurring incidents
+# produce the same set of message templates. When they do, the previous
+# INVESTIGATION SUMMARY is reused with the occurrence-specific fields
+# patched in, instead of asking Gemini to summarize the same errors again.
+summary_cache = MemoryCache(max_size_mb=SUMMARY_CACHE_MB)
+
+
+def _tool_text(tool_response) -> str:
+    """Concatenated text content of an MCP CallToolResult (object or dict)."""
+    if isinstance(tool_response, dict):
+        content = tool_response.get("content") or []
+    else:
+        content = getattr(tool_response, "content", None) or []
+    texts = [
+        part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+        for part in content
+    ]
+    return "".join(text for text in texts if text)
+
+
+def _digest_log_search(
+    tool: BaseTool, args: dict, tool_context: ToolContext, tool_response
+) -> None:
+    """after_tool_callback: remember the templated signature of the logs."""
+    if tool.name == "search_logs":
+        digest = digest_search_logs(
+            _tool_text(tool_response), query=str(args.get("query", ""))
+        )
+        tool_context.state["log_digest"] = digest
+
+
+def _reuse_cached_summary(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """before_model_callback: answer from summary_cache on a known signature."""
+    digest = callback_context.state.get("log_digest")
+    if not digest:
+        return None
+    summary = summary_cache.get(digest["signature"])
+    if summary is None:
+        return None
+    logger.info("Investigation summary cache hit, skipping Gemini summarization")
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[types.Part(text=patch_report_fields(summary, digest["fields"]))],
+        )
+    )
+
+
+gemini_limiter = AsyncLimiter(GEMINI_CALLS_PER_MINUTE, 60)
+
+
+async def _throttle_gemini(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """before_model_callback: wait for GEMINI_CALLS_PER_MINUTE capacity."""
+    await gemini_limiter.acquire()
+    return None
+
+
+def _store_summary(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> None:
+    """after_model_callback: cache the summary written for a log signature."""
+    digest = callback_context.state.get("log_digest")
+    if not digest or llm_response.partial or not llm_response.content:
+        return None
+    parts = llm_response.content.parts or []
+    if any(part.function_call for part in parts):
+        return None
+    text = "".join(part.text or "" for part in parts)
+    if "INVESTIGATION SUMMARY" in text:
+        summary_cache.put(digest["signature"], text)
+    return None
+
+
+# Instructions keep their static text first and the per-alert state
+# placeholders last, so consecutive requests share a long identical prefix
+# that Gemini's implicit context caching can reuse.
+
 # --- Sub-Agent 1: Datadog Investigation Agent ---
 investigation_agent = LlmAgent(
     name="datadog_investigator",
@@ -71,24 +666,11 @@ If NO logs found, report:
 - Suggest the alert may be transient or already resolved
 
 ALWAYS provide structured output even if no errors found.""",
-    tools=[
-        McpToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="node",
-                    args=["../datadog-mcp/dist/index.js"],
-                    env={
-                        "DD_API_KEY": DD_API_KEY,
-                        "DD_APP_KEY": DD_APP_KEY,
-                        "DD_SITE": DD_SITE,
-                        "PATH": os.getenv("PATH")
-                    }
-                ),
-                timeout=30
-            ),
-            tool_filter=['search_logs']
-        )
-    ],
+    tools=[datadog_toolset],
+    after_tool_callback=_digest_log_search,
+    # Cache hits answer before _throttle_gemini, so they use no capacity
+    before_model_callback=[_reuse_cached_summary, _throttle_gemini],
+    after_model_callback=_store_summary,
     output_key="investigation_report"  # Stores output in session state
 )
 
@@ -98,10 +680,7 @@ decision_agent = LlmAgent(
     model="gemini-2.5-flash-lite",
     instruction="""You are an SRE decision-making specialist.
 
-Based on the investigation report, determine the appropriate action:
-
-**Investigation Report:**
-{investigation_report}
+Based on the investigation report at the end of these instructions, determine the appropriate action:
 
 **Decision Criteria:**
 - **IGNORE**: No errors found, transient spike (< 2 errors), already recovered, known noise
@@ -118,7 +697,12 @@ SERVICES_AFFECTED: [comma-separated list of services from investigation]
 RECOMMENDED_ACTION: [Brief action item, e.g., "Investigate compilation-service memory leak"]
 ```
 
-Be decisive. Base your decision on concrete evidence from the investigation.""",
+Be decisive. Base your decision on concrete evidence from the investigation.
+
+**Investigation Report:**
+{investigation_report}""",
+    include_contents="none",  # The report above is all it needs
+    before_model_callback=_throttle_gemini,
     output_key="decision"  # No tools - pure reasoning
 )
 
@@ -130,13 +714,8 @@ ticket_agent = LlmAgent(
     model="gemini-2.5-flash-lite",
     instruction=f"""You are an Azure DevOps ticket creation specialist.
 
-**Decision:**
-{{decision}}
-
-**Investigation Report:**
-{{investigation_report}}
-
 **Instructions:**
+The decision and investigation report for this alert are at the end of these instructions.
 If the decision is TICKET, create a detailed Bug work item using `wit_create_work_item`.
 
 **Tool Parameters for wit_create_work_item:**
@@ -224,45 +803,233 @@ If decision is IGNORE or MONITOR, output:
 "No ticket created - [reason from decision]. Recommended action: [action from decision]"
 
 After creating ticket, confirm: "✅ Ticket #[ID] created in {ADO_PROJECT} project"
+
+**Decision:**
+{{decision}}
+
+**Investigation Report:**
+{{investigation_report}}
 """,
-    tools=[
-        McpToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command="npx",
-                    args=[
-                        "-y",
-                        "@azure-devops/mcp",
-                        ADO_ORG_NAME,
-                        "--authentication",
-                        "envvar",
-                        "-d", "core", "work-items"
-                    ],
-                    env={
-                        "ADO_PAT": ADO_PAT,
-                        "ADO_MCP_AUTH_TOKEN": ADO_PAT,
-                        "AZURE_DEVOPS_ORG_URL": f"https://dev.azure.com/{ADO_ORG_NAME}",
-                        "AZURE_DEVOPS_AUTH_METHOD": "pat",
-                        "AZURE_DEVOPS_PAT": ADO_PAT,
-                        "AZURE_DEVOPS_DEFAULT_PROJECT": os.getenv("ADO_PROJECT", "nyaya"),
-                        "PATH": os.getenv("PATH")
-                    }
-                ),
-                timeout=30
-            ),
-            tool_filter=['wit_create_work_item', 'wit_update_work_item']
-        )
-    ],
+    tools=[ado_toolset],
+    include_contents="none",  # Decision and report come from state above
+    before_model_callback=_throttle_gemini,
     output_key="ticket_result"
 )
 
-# --- Root Agent: Sequential Orchestration ---
-root_agent = SequentialAgent(
+# --- Parallel Preparation ---
+_prefetch_semaphore = asyncio.Semaphore(MAX_PARALLEL)
+
+
+# Strong references to running prefetches (the event loop only keeps weak ones)
+_prefetch_tasks: set[asyncio.Task] = set()
+
+
+async def prefetch_ado_context() -> None:
+    """
+    Prime the Azure DevOps MCP session (spawn + initialize + list_tools)
+    so the ticket agent finds it warm. Bounded by MAX_PARALLEL so a burst
+    of webhooks does not spawn a burst of npx processes.
+    """
+    async with _prefetch_semaphore:
+        await ado_toolset.get_tools()
+
+
+def _prefetch_done(task: asyncio.Task) -> None:
+    _prefetch_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # Prefetch is speculative; the ticket agent will connect on demand
+        logger.warning("ADO MCP prefetch failed: %s", task.exception())
+
+
+def start_ado_prefetch() -> asyncio.Task:
+    """Start prefetch_ado_context in the background and return its task."""
+    task = asyncio.create_task(prefetch_ado_context())
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_done)
+    return task
+
+
+async def cancel_ado_prefetches() -> None:
+    """Cancel background prefetches. Called on shutdown, before the pool."""
+    tasks = list(_prefetch_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# --- Root Agent: Pipeline Orchestration ---
+# Outputs used when the investigation found no error logs, in the formats
+# decision_maker and ticket_creator would produce
+NO_ERRORS_DECISION = """DECISION: IGNORE
+REASON: No error logs found in the specified time range. The alert is likely transient or already resolved.
+SEVERITY: LOW
+PRIORITY: P3
+SERVICES_AFFECTED: none
+RECOMMENDED_ACTION: None required; re-check only if the alert fires again"""
+NO_ERRORS_TICKET_RESULT = (
+    "No ticket created - No error logs found in the specified time range. "
+    "Recommended action: None required; re-check only if the alert fires again"
+)
+
+
+class GeminiOpsPipeline(BaseAgent):
+    """
+    Runs investigate → decide → ticket, overlapping the investigation with
+    independent preparation (ADO MCP warmup) instead of running strictly
+    one step after another. Decisions come from the rule engine in
+    rules.py and tickets from tickets.py instead of Gemini whenever the
+    agent outputs parse, and alerts whose investigation found no error
+    logs stop after the investigation.
+    """
+
+    investigation_agent: LlmAgent
+    decision_agent: LlmAgent
+    ticket_agent: LlmAgent
+
+    def __init__(
+        self,
+        name: str,
+        investigation_agent: LlmAgent,
+        decision_agent: LlmAgent,
+        ticket_agent: LlmAgent,
+        description: str = "",
+    ):
+        super().__init__(
+            name=name,
+            description=description,
+            investigation_agent=investigation_agent,
+            decision_agent=decision_agent,
+            ticket_agent=ticket_agent,
+            sub_agents=[investigation_agent, decision_agent, ticket_agent],
+        )
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        # Steps wait only on what they depend on:
+        #   ADO warmup      <- nothing (starts now)
+        #   decision        <- investigation
+        #   ticket          <- decision, ADO warmup
+        # An alert that never reaches the ticket step does not wait for the
+        # warmup; it finishes in the background and serves later alerts.
+        prefetch = start_ado_prefetch()
+
+        async for event in self.investigation_agent.run_async(ctx):
+            yield event
+
+        if reports_no_errors(ctx.session.state.get("investigation_report", "")):
+            # Nothing to decide or file: answer for both agents without Gemini
+            logger.info(
+                "No error logs found, skipping %s and %s",
+                self.decision_agent.name,
+                self.ticket_agent.name,
+            )
+            yield self._state_event(
+                ctx, self.decision_agent, "decision", NO_ERRORS_DECISION
+            )
+            yield self._state_event(
+                ctx, self.ticket_agent, "ticket_result", NO_ERRORS_TICKET_RESULT
+            )
+            return
+
+        async for event in self._decide(ctx):
+            yield event
+
+        async for event in self._ticket(ctx, prefetch):
+            yield event
+
+    async def _decide(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        """Decide with rules.decide, falling back to the decision agent."""
+        report = parse_investigation_report(
+            ctx.session.state.get("investigation_report", "")
+        )
+
+        if report is not None:
+            logger.info("Decided by rules, skipping %s", self.decision_agent.name)
+            yield self._state_event(
+                ctx, self.decision_agent, "decision", decide(report)
+            )
+            return
+
+        # Malformed report: let Gemini interpret it
+        async for event in self.decision_agent.run_async(ctx):
+            yield event
+
+    async def _ticket(
+        self, ctx: InvocationContext, prefetch: asyncio.Task
+    ) -> AsyncGenerator[Event, None]:
+        """
+        Create the work item from tickets.render_ticket, or report that none
+        was needed. The ticket agent only runs when the decision or the
+        investigation cannot be parsed.
+        """
+        state = ctx.session.state
+        decision = parse_decision(state.get("decision", ""))
+        action = decision_action(decision) if decision is not None else None
+        report = parse_investigation_report(state.get("investigation_report", ""))
+
+        if action in ("IGNORE", "MONITOR"):
+            result = (
+                f"No ticket created - {decision.get('REASON', '').rstrip('.')}. "
+                f"Recommended action: {decision.get('RECOMMENDED_ACTION', 'N/A')}"
+            )
+            yield self._state_event(ctx, self.ticket_agent, "ticket_result", result)
+            return
+
+        # Failures are logged by _prefetch_done; the session reconnects itself
+        await asyncio.wait([prefetch])
+
+        if action is None or report is None:
+            async for event in self.ticket_agent.run_async(ctx):
+                yield event
+            return
+
+        payload = render_ticket(
+            decision,
+            report,
+            project=ADO_PROJECT,
+            dd_site=DD_SITE,
+            alert_date=state.get("alert_date"),
+        )
+        logger.info(
+            "Creating work item directly, skipping %s", self.ticket_agent.name
+        )
+        response = await ado_toolset.call_tool("wit_create_work_item", payload)
+        text = _tool_text(response)
+
+        if response.isError:
+            logger.warning("wit_create_work_item failed: %s", text)
+            result = f"❌ Ticket creation failed in {ADO_PROJECT} project: {text}"
+        else:
+            try:
+                work_item_id = json.loads(text).get("id")
+            except (ValueError, AttributeError):
+                work_item_id = None
+            result = (
+                f"✅ Ticket #{work_item_id} created in {ADO_PROJECT} project"
+                if work_item_id is not None
+                else f"✅ Ticket created in {ADO_PROJECT} project"
+            )
+        yield self._state_event(ctx, self.ticket_agent, "ticket_result", result)
+
+    @staticmethod
+    def _state_event(
+        ctx: InvocationContext, agent: BaseAgent, key: str, text: str
+    ) -> Event:
+        """Event that stands in for agent's output, as if output_key wrote it."""
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=agent.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=EventActions(state_delta={key: text}),
+        )
+
+
+root_agent = GeminiOpsPipeline(
     name="geminiops_bridge",
-    sub_agents=[
-        investigation_agent,
-        decision_agent,
-        ticket_agent
-    ],
+    investigation_agent=investigation_agent,
+    decision_agent=decision_agent,
+    ticket_agent=ticket_agent,
     description="Autonomous incident response pipeline: Investigate → Decide → Act"
 )
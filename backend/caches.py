@@ -0,0 +1,37 @@
+"""
+Caches that let recurring alerts skip Gemini calls.
+
+MemoryCache: in-process LRU used for investigation summaries, keyed on the
+templated search_logs result.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+
+
+class MemoryCache:
+    """LRU string cache bounded by the total size of its entries."""
+
+    def __init__(self, max_size_mb: int = 100):
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._size = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def _sizeof(key: str, value: str) -> int:
+        return len(key.encode()) + len(value.encode())
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if key in self._entries:
+            self._size -= self._sizeof(key, self._entries.pop(key))
+        self._entries[key] = value
+        self._size += self._sizeof(key, value)
+        while self._size > self._max_bytes and self._entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._size -= self._sizeof(old_key, old_value)
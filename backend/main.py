@@ -5,18 +5,56 @@ FastAPI webhook endpoint that receives Datadog alerts and processes them
 through the agent pipeline in the background.
 """
 
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Response
 from pydantic import BaseModel, ConfigDict
-from google.adk.runners import InMemoryRunner
+from cachetools import TTLCache
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService, InMemorySessionService
 from google.genai import types
 from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener
+import asyncio
+import atexit
+import hashlib
+import logging
 import os
+import queue
+import string
+import sys
 
 # Load environment variables BEFORE importing agent
 load_dotenv()
 
+# Logging: coroutines on the event loop only enqueue records; the blocking
+# writes happen on the QueueListener's thread. Pipeline output goes to
+# stdout, errors (with tracebacks) to stderr.
+_log_queue = queue.SimpleQueue()
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.addFilter(lambda record: record.levelno < logging.ERROR)
+_stderr_handler = logging.StreamHandler(sys.stderr)
+_stderr_handler.setLevel(logging.ERROR)
+_log_listener = QueueListener(
+    _log_queue, _stdout_handler, _stderr_handler, respect_handler_level=True
+)
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(message)s",
+    handlers=[QueueHandler(_log_queue)]
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# Pipeline output at INFO; library loggers stay at WARNING
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logging.getLogger("agent").setLevel(logging.INFO)
+
 # Import the agent (must be after load_dotenv)
-from agent import root_agent
+from agent import cancel_ado_prefetches, mcp_pool, root_agent
+from redis_session_service import RedisSessionService
+from tickets import alert_epoch_seconds
 
 # Initialize FastAPI
 app = FastAPI(
@@ -25,12 +63,52 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Session storage: Redis when REDIS_URL is set, so sessions are shared by
+# all uvicorn workers and survive restarts; in-process otherwise
+REDIS_URL = os.getenv("REDIS_URL")
+session_service: BaseSessionService
+if REDIS_URL:
+    session_service = RedisSessionService(
+        url=REDIS_URL,
+        ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+    )
+else:
+    session_service = InMemorySessionService()
+
 # Initialize ADK Runner (singleton, defined at module level)
-runner = InMemoryRunner(
+runner = Runner(
     agent=root_agent,
-    app_name="geminiops_bridge"
+    app_name="geminiops_bridge",
+    session_service=session_service,
+    artifact_service=InMemoryArtifactService(),
+    memory_service=InMemoryMemoryService()
 )
 
+# Alert admission control: bounded concurrency so an alert storm queues up
+# instead of tripping Gemini 429s (the per-call rate limit is
+# GEMINI_CALLS_PER_MINUTE in agent.py)
+MAX_CONCURRENT_ALERTS = int(os.getenv("MAX_CONCURRENT_ALERTS", "4"))
+MAX_QUEUED_ALERTS = int(os.getenv("MAX_QUEUED_ALERTS", "50"))
+
+_gemini_sem = asyncio.Semaphore(MAX_CONCURRENT_ALERTS)
+_alerts_queued = 0
+_alerts_running = 0
+
+# Alert deduplication: repeat deliveries of the same alert (webhook
+# retries, a monitor flapping within a few minutes). An alert whose
+# fingerprint is in flight, or finished within DEDUP_TTL_SECONDS, is
+# acknowledged without re-running the pipeline. Fingerprints include a
+# 5-minute time bucket, so scheduled re-notifications (renotify_interval)
+# are new alerts.
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", "900"))
+
+# In-flight entries are added before the response is sent and removed by
+# process_alert. Starlette skips background tasks when sending the response
+# fails (client disconnected), so they expire too rather than deduping that
+# alert until restart.
+_inflight: TTLCache = TTLCache(maxsize=1024, ttl=DEDUP_TTL_SECONDS)
+_recent_alerts: TTLCache = TTLCache(maxsize=1024, ttl=DEDUP_TTL_SECONDS)
+
 # Pydantic model for Datadog webhook payload
 class DatadogAlert(BaseModel):
     """Datadog webhook alert payload"""
@@ -54,34 +132,140 @@ class DatadogAlert(BaseModel):
     body: str
     tags: list[str]
 
-@app.post("/api/webhook/datadog")
+# Response models. Declaring them lets FastAPI (0.130+) serialize responses
+# straight to JSON bytes with pydantic-core instead of going through
+# jsonable_encoder and json.dumps.
+class WebhookResponse(BaseModel):
+    """Webhook acknowledgement (accepted, deduped or rejected)"""
+    status: str
+    alert_id: str
+    message: str
+    ticket: str | None = None  # Earlier ticket result, for deduped alerts
+
+class AlertCounts(BaseModel):
+    running: int
+    queued: int
+
+class HealthResponse(BaseModel):
+    status: str
+    agent: str
+    app: str
+    alerts: AlertCounts
+
+class ApiInfo(BaseModel):
+    name: str
+    version: str
+    description: str
+    endpoints: dict[str, str]
+
+def alert_fingerprint(alert: DatadogAlert) -> str:
+    """Same monitor (title), same services, same 5-minute bucket"""
+    services = sorted(tag for tag in alert.tags if tag.startswith("service:"))
+    bucket = alert_epoch_seconds(alert.date) // 300
+    key = f"{alert.title}|{','.join(services)}|{bucket}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+# User message sent to the agent pipeline, compiled once at import
+_ALERT_TMPL = string.Template("""
+Datadog Alert Received:
+- ID: $id
+- Type: $alert_type
+- Title: $title
+- Timestamp: $date
+- Description: $body
+- Tags: $tags
+
+Please investigate this alert and take appropriate action.
+""")
+
+@app.post(
+    "/api/webhook/datadog",
+    status_code=202,
+    response_model_exclude_unset=True
+)
 async def handle_datadog_webhook(
     alert: DatadogAlert,
-    background_tasks: BackgroundTasks
-):
+    background_tasks: BackgroundTasks,
+    response: Response
+) -> WebhookResponse:
     """
     Receives Datadog webhook alerts and triggers agent pipeline processing
 
     Returns immediately with 202 Accepted status.
     Processing happens asynchronously in background.
+    Returns 429 when MAX_QUEUED_ALERTS are already waiting, so Datadog
+    retries later instead of the backlog growing without bound.
+    Re-notifications of an alert already being handled are "deduped".
     """
+    fingerprint = alert_fingerprint(alert)
+    if fingerprint in _inflight or fingerprint in _recent_alerts:
+        return WebhookResponse(
+            status="deduped",
+            alert_id=alert.id,
+            ticket=_recent_alerts.get(fingerprint),
+            message=f"Alert {alert.id} duplicates an alert already being handled"
+        )
+
+    if _alerts_queued >= MAX_QUEUED_ALERTS:
+        response.status_code = 429
+        return WebhookResponse(
+            status="rejected",
+            alert_id=alert.id,
+            message=f"Alert queue full ({_alerts_queued} waiting), retry later"
+        )
+
     # Add processing as background task (non-blocking)
+    _inflight[fingerprint] = asyncio.get_running_loop().create_future()
     background_tasks.add_task(process_alert, alert)
 
-    return {
-        "status": "accepted",
-        "alert_id": alert.id,
-        "message": f"Alert {alert.id} accepted for processing"
-    }
+    return WebhookResponse(
+        status="accepted",
+        alert_id=alert.id,
+        message=f"Alert {alert.id} accepted for processing"
+    )
 
 async def process_alert(alert: DatadogAlert):
     """
     Background task to process alert through agent pipeline
 
+    At most MAX_CONCURRENT_ALERTS alerts run the pipeline at once; the rest
+    wait here (reported as "queued" by /health).
+    """
+    global _alerts_queued, _alerts_running
+    fingerprint = alert_fingerprint(alert)
+    ticket_result = None
+
+    try:
+        _alerts_queued += 1
+        try:
+            await _gemini_sem.acquire()
+        finally:
+            _alerts_queued -= 1
+
+        _alerts_running += 1
+        try:
+            ticket_result = await _process_alert(alert)
+        finally:
+            _alerts_running -= 1
+            _gemini_sem.release()
+    finally:
+        # Later duplicates get the outcome from _recent_alerts instead. A
+        # failed run (None) is not recorded, so retries of it run again.
+        if ticket_result is not None:
+            _recent_alerts[fingerprint] = ticket_result
+        inflight = _inflight.pop(fingerprint, None)
+        if inflight is not None and not inflight.done():
+            inflight.set_result(ticket_result)
+
+async def _process_alert(alert: DatadogAlert) -> str | None:
+    """
+    Process one alert through the agent pipeline, returning the ticket
+    agent's result (None if the pipeline failed)
+
     Flow:
     1. Create session for this alert
     2. Format alert as user message
-    3. Run SequentialAgent pipeline
+    3. Run agent pipeline (investigation overlaps ADO MCP warmup)
     4. Log results (investigation → decision → ticket)
     """
     user_id = "datadog_webhook"
@@ -92,21 +276,19 @@ async def process_alert(alert: DatadogAlert):
         await runner.session_service.create_session(
             app_name="geminiops_bridge",
             user_id=user_id,
-            session_id=session_id
+            session_id=session_id,
+            state={"alert_date": alert.date}  # Detection time for the ticket
         )
 
         # Format alert as user message for the agent
-        alert_message = f"""
-Datadog Alert Received:
-- ID: {alert.id}
-- Type: {alert.alert_type}
-- Title: {alert.title}
-- Timestamp: {alert.date}
-- Description: {alert.body}
-- Tags: {', '.join(alert.tags)}
-
-Please investigate this alert and take appropriate action.
-"""
+        alert_message = _ALERT_TMPL.substitute(
+            id=alert.id,
+            alert_type=alert.alert_type,
+            title=alert.title,
+            date=alert.date,
+            body=alert.body,
+            tags=', '.join(alert.tags)
+        )
 
         # Create content for agent
         content = types.Content(
@@ -115,10 +297,12 @@ Please investigate this alert and take appropriate action.
         )
 
         # Run agent pipeline (streams events)
-        print(f"\n{'='*60}")
-        print(f"Processing alert {alert.id}...")
-        print(f"{'='*60}")
+        banner = '=' * 60
+        logger.info(f"\n{banner}\nProcessing alert {alert.id}...\n{banner}")
 
+        # Event output is buffered per agent and logged once at each agent's
+        # final response, rather than one write per part
+        buffer: list[str] = []
         async for event in runner.run_async(
             user_id=user_id,
             session_id=session_id,
@@ -133,13 +317,18 @@ Please investigate this alert and take appropriate action.
             if event.content and event.content.parts:
                 for part in event.content.parts:
                     if part.text:
-                        print(f"\n[{role}] {part.text}")
+                        buffer.append(f"\n[{role}] {part.text}")
                     if part.function_call:
-                        print(f"\n[{role}] Calling tool: {part.function_call.name} with args: {part.function_call.args}")
-            
+                        buffer.append(f"\n[{role}] Calling tool: {part.function_call.name} with args: {part.function_call.args}")
+
             # Special handling for final responses
             if event.is_final_response():
-                print(f"--- Final response from {role} ---")
+                buffer.append(f"--- Final response from {role} ---")
+                logger.info("\n".join(buffer))
+                buffer.clear()
+
+        if buffer:
+            logger.info("\n".join(buffer))
 
         # Retrieve final session state to see all agent outputs
         session = await runner.session_service.get_session(
@@ -149,47 +338,81 @@ Please investigate this alert and take appropriate action.
         )
 
         # Log final state for debugging
-        print(f"\n{'='*60}")
-        print(f"Alert {alert.id} processing complete")
-        print(f"{'='*60}")
-        print(f"Investigation: {session.state.get('investigation_report', 'N/A')[:200]}...")
-        print(f"Decision: {session.state.get('decision', 'N/A')}")
-        print(f"Ticket: {session.state.get('ticket_result', 'N/A')}")
-        print(f"{'='*60}\n")
-
-    except Exception as e:
-        print(f"ERROR processing alert {alert.id}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.info("\n".join([
+            f"\n{banner}",
+            f"Alert {alert.id} processing complete",
+            banner,
+            f"Investigation: {session.state.get('investigation_report', 'N/A')[:200]}...",
+            f"Decision: {session.state.get('decision', 'N/A')}",
+            f"Ticket: {session.state.get('ticket_result', 'N/A')}",
+            f"{banner}\n",
+        ]))
+        return session.state.get('ticket_result')
+
+    except Exception:
+        # Goes through the log queue; the write to stderr happens on the
+        # listener thread, off the event loop
+        logger.exception("alert %s failed", alert.id)
+        return None
+
+@app.on_event("startup")
+async def warm_mcp_pool():
+    """
+    Spawn and initialize the MCP servers before the first alert arrives,
+    so it does not pay the npx install + launch cold start
+    """
+    await mcp_pool.connect_all()
+    await mcp_pool.list_tools_all()
+
+@app.on_event("shutdown")
+async def shutdown_mcp_pool():
+    """Close pooled MCP sessions and terminate their server subprocesses"""
+    await cancel_ado_prefetches()
+    await mcp_pool.shutdown()
+
+@app.on_event("shutdown")
+async def close_session_service():
+    """Close the Redis connection pool, if sessions are stored in Redis"""
+    if isinstance(session_service, RedisSessionService):
+        await session_service.close()
 
 @app.get("/health")
-async def health_check():
+async def health_check() -> HealthResponse:
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "agent": root_agent.name,
-        "app": "GeminiOps Bridge"
-    }
+    return HealthResponse(
+        status="healthy",
+        agent=root_agent.name,
+        app="GeminiOps Bridge",
+        alerts=AlertCounts(running=_alerts_running, queued=_alerts_queued)
+    )
 
 @app.get("/")
-async def root():
+async def root() -> ApiInfo:
     """Root endpoint with API info"""
-    return {
-        "name": "GeminiOps Bridge",
-        "version": "1.0.0",
-        "description": "Autonomous incident response system",
-        "endpoints": {
+    return ApiInfo(
+        name="GeminiOps Bridge",
+        version="1.0.0",
+        description="Autonomous incident response system",
+        endpoints={
             "webhook": "POST /api/webhook/datadog",
             "health": "GET /health"
         }
-    }
+    )
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 3000))
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # Multiple workers need an import string; with REDIS_URL set they all
+    # share sessions. Each worker keeps its own MCP pool and alert queue.
+    # A single worker serves this module's app, so main is not imported a
+    # second time (second Runner, session pool and log listener).
     uvicorn.run(
-        app,
+        "main:app" if workers > 1 else app,
         host="0.0.0.0",
         port=port,
+        workers=workers,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
         log_level="info"
     )
@@ -0,0 +1,216 @@
+"""
+Redis-backed ADK session service.
+
+Lets several uvicorn workers (or hosts) share alert sessions, and keeps
+in-flight investigations across restarts. Layout per session:
+
+    geminiops:{app}:{user}:{session_id}          hash  last_update_time
+    geminiops:{app}:{user}:{session_id}:state    hash  key -> JSON value
+    geminiops:{app}:{user}:{session_id}:events   list  Event JSON
+    geminiops:{app}:{user}:sessions              set   session ids
+
+"app:" and "user:" prefixed state keys live in shared hashes
+(geminiops:app:{app} and geminiops:user:{app}:{user}), matching
+InMemorySessionService semantics.
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Optional
+
+import redis.asyncio as redis
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+
+PREFIX = "geminiops"
+
+
+class RedisSessionService(BaseSessionService):
+    """BaseSessionService storing sessions in Redis via redis.asyncio."""
+
+    def __init__(self, url: str, ttl_seconds: int = 7 * 24 * 3600):
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._ttl = ttl_seconds
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    # --- Keys ---
+    @staticmethod
+    def _session_key(app_name: str, user_id: str, session_id: str) -> str:
+        return f"{PREFIX}:{app_name}:{user_id}:{session_id}"
+
+    @staticmethod
+    def _index_key(app_name: str, user_id: str) -> str:
+        return f"{PREFIX}:{app_name}:{user_id}:sessions"
+
+    @staticmethod
+    def _app_state_key(app_name: str) -> str:
+        return f"{PREFIX}:app:{app_name}"
+
+    @staticmethod
+    def _user_state_key(app_name: str, user_id: str) -> str:
+        return f"{PREFIX}:user:{app_name}:{user_id}"
+
+    # --- BaseSessionService ---
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (
+            session_id.strip()
+            if session_id and session_id.strip()
+            else str(uuid.uuid4())
+        )
+        key = self._session_key(app_name, user_id, session_id)
+        now = time.time()
+
+        # Same as InMemorySessionService: re-creating an id replaces it
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(key, f"{key}:state", f"{key}:events")
+        pipe.hset(key, "last_update_time", now)
+        if state:
+            pipe.hset(
+                f"{key}:state",
+                mapping={k: json.dumps(v) for k, v in state.items()},
+            )
+            pipe.expire(f"{key}:state", self._ttl)
+        pipe.expire(key, self._ttl)
+        pipe.sadd(self._index_key(app_name, user_id), session_id)
+        await pipe.execute()
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=dict(state or {}),
+            last_update_time=now,
+        )
+        return await self._merge_state(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = self._session_key(app_name, user_id, session_id)
+        start = 0
+        if config and config.num_recent_events:
+            start = -config.num_recent_events
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hget(key, "last_update_time")
+        pipe.hgetall(f"{key}:state")
+        pipe.lrange(f"{key}:events", start, -1)
+        last_update_time, state, events = await pipe.execute()
+        if last_update_time is None:
+            return None
+
+        events = [Event.model_validate_json(raw) for raw in events]
+        if config and config.after_timestamp:
+            events = [e for e in events if e.timestamp >= config.after_timestamp]
+
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state={k: json.loads(v) for k, v in state.items()},
+            events=events,
+            last_update_time=float(last_update_time),
+        )
+        return await self._merge_state(session)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str
+    ) -> ListSessionsResponse:
+        sessions = []
+        for session_id in await self._redis.smembers(
+            self._index_key(app_name, user_id)
+        ):
+            session = await self.get_session(
+                app_name=app_name,
+                user_id=user_id,
+                session_id=session_id,
+                config=GetSessionConfig(num_recent_events=1),
+            )
+            if session is None:
+                # Expired; drop the stale index entry
+                await self._redis.srem(
+                    self._index_key(app_name, user_id), session_id
+                )
+                continue
+            session.events = []
+            sessions.append(session)
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        key = self._session_key(app_name, user_id, session_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(key, f"{key}:state", f"{key}:events")
+        pipe.srem(self._index_key(app_name, user_id), session_id)
+        await pipe.execute()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Updates the caller's session object (state + events)
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = self._session_key(session.app_name, session.user_id, session.id)
+        session_delta, app_delta, user_delta = {}, {}, {}
+        if event.actions and event.actions.state_delta:
+            for k, v in event.actions.state_delta.items():
+                if k.startswith(State.TEMP_PREFIX):
+                    continue
+                if k.startswith(State.APP_PREFIX):
+                    app_delta[k.removeprefix(State.APP_PREFIX)] = json.dumps(v)
+                elif k.startswith(State.USER_PREFIX):
+                    user_delta[k.removeprefix(State.USER_PREFIX)] = json.dumps(v)
+                else:
+                    session_delta[k] = json.dumps(v)
+
+        pipe = self._redis.pipeline(transaction=True)
+        if session_delta:
+            pipe.hset(f"{key}:state", mapping=session_delta)
+            pipe.expire(f"{key}:state", self._ttl)
+        if app_delta:
+            pipe.hset(self._app_state_key(session.app_name), mapping=app_delta)
+        if user_delta:
+            pipe.hset(
+                self._user_state_key(session.app_name, session.user_id),
+                mapping=user_delta,
+            )
+        pipe.rpush(f"{key}:events", event.model_dump_json(exclude_none=True))
+        pipe.expire(f"{key}:events", self._ttl)
+        pipe.hset(key, "last_update_time", event.timestamp)
+        pipe.expire(key, self._ttl)
+        await pipe.execute()
+        return event
+
+    async def _merge_state(self, session: Session) -> Session:
+        """Overlay app- and user-scoped state, as InMemorySessionService does."""
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hgetall(self._app_state_key(session.app_name))
+        pipe.hgetall(self._user_state_key(session.app_name, session.user_id))
+        app_state, user_state = await pipe.execute()
+        for k, v in app_state.items():
+            session.state[State.APP_PREFIX + k] = json.loads(v)
+        for k, v in user_state.items():
+            session.state[State.USER_PREFIX + k] = json.loads(v)
+        return session
@@ -0,0 +1,230 @@
+"""
+Parsing helpers for agent outputs.
+
+The investigation and decision agents emit loosely structured text
+(see their instructions in agent.py). These helpers turn that text back
+into fields so the orchestrator can make cheap decisions about it
+without another Gemini call.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# "- **Error Count**: 12" / "- **Error Count:** 12" / "* **Error Count**: 12"
+_FIELD_RE = re.compile(r"^\s*[-*]\s+\*\*(?P<label>[^*:]+):?\*\*:?\s*(?P<value>.*)$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*]|\d+\.)\s+")
+_INT_RE = re.compile(r"\d+")
+# Stack Traces values that mean "there are none" ("None", "N/A",
+# "Not available", "No traces in results")
+_NO_STACK_TRACES_RE = re.compile(r"^\W*(?:none|n/?a|not|no)\b", re.IGNORECASE)
+
+# Volatile tokens stripped from log messages, Drain-style, so that two
+# occurrences of the same error produce the same template
+_VOLATILE_RES = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[t ][\d:.]+(?:z|[+-]\d{2}:?\d{2})?"), "<TS>"),
+    (
+        re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"),
+        "<UUID>",
+    ),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{12,}\b"), "<HEX>"),
+    (_INT_RE, "<N>"),
+]
+
+# "DECISION: TICKET" lines from the decision agent
+_DECISION_RE = re.compile(
+    r"^\s*(?P<key>DECISION|REASON|SEVERITY|PRIORITY|SERVICES_AFFECTED|RECOMMENDED_ACTION)"
+    r"\s*:\s*(?P<value>.*)$"
+)
+# The action at the start of a DECISION value ("[TICKET]", "TICKET.")
+_ACTION_RE = re.compile(r"\W*(IGNORE|MONITOR|TICKET)\b", re.IGNORECASE)
+
+
+# Investigation agent's no-results line ("No error logs found in the
+# specified time range"), only at the start of a line, after any bullet
+# or quote, so the phrase inside another field does not match
+_NO_ERRORS_RE = re.compile(r"^\W*no error logs found", re.IGNORECASE | re.MULTILINE)
+
+
+def templatize_message(message: str) -> str:
+    """Reduce an error message to its template so recurrences compare equal."""
+    template = message.strip().strip('"`').lower()
+    for pattern, placeholder in _VOLATILE_RES:
+        template = pattern.sub(placeholder, template)
+    return template
+
+
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@dataclass
+class InvestigationReport:
+    """Fields extracted from the investigation agent's INVESTIGATION SUMMARY."""
+
+    error_count: int
+    services: list[str] = field(default_factory=list)
+    top_errors: list[str] = field(default_factory=list)
+    severity: Optional[str] = None
+    fields: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def stack_traces(self) -> str:
+        """The Stack Traces field, or "" when it says there are none."""
+        traces = self.fields.get("stack traces", "").strip()
+        return "" if _NO_STACK_TRACES_RE.match(traces) else traces
+
+
+def reports_no_errors(text: str) -> bool:
+    """
+    True when the investigation report says the log search found nothing:
+    an Error Count of 0, or for reports without one, the no-results line.
+    """
+    report = parse_investigation_report(text)
+    if report is not None:
+        return report.error_count == 0
+    return bool(_NO_ERRORS_RE.search(text))
+
+
+def parse_investigation_report(text: str) -> Optional[InvestigationReport]:
+    """
+    Parse an investigation report. Returns None when the report does not
+    carry a numeric Error Count, i.e. it cannot be reasoned about without
+    the LLM.
+    """
+    fields: dict[str, list[str]] = {}
+    current = None
+
+    for line in text.splitlines():
+        match = _FIELD_RE.match(line)
+        if match:
+            current = match.group("label").strip().lower()
+            fields[current] = [match.group("value").strip()]
+        elif current and line.strip():
+            fields[current].append(line.strip())
+
+    count_lines = fields.get("error count")
+    count = _INT_RE.search(count_lines[0]) if count_lines else None
+    if count is None:
+        return None
+
+    services_text = fields.get("services affected", [""])[0]
+    top_errors = []
+    for line in fields.get("top error messages", []):
+        message = _BULLET_RE.sub("", line).strip()
+        if message and message.lower() not in ("none", "n/a"):
+            top_errors.append(message)
+
+    severity = None
+    if fields.get("severity"):
+        level = re.search(r"LOW|MEDIUM|HIGH|CRITICAL", fields["severity"][0].upper())
+        severity = level.group(0) if level else None
+
+    return InvestigationReport(
+        error_count=int(count.group(0)),
+        services=_split_list(services_text),
+        top_errors=top_errors,
+        severity=severity,
+        fields={label: "\n".join(lines) for label, lines in fields.items()},
+    )
+
+
+def parse_decision(text: str) -> Optional[dict[str, str]]:
+    """
+    Parse the decision block into {"DECISION": ..., "SEVERITY": ..., ...}.
+    Returns None when no DECISION line is present.
+    """
+    decision = {}
+    for line in text.splitlines():
+        match = _DECISION_RE.match(line)
+        if match:
+            decision[match.group("key")] = match.group("value").strip()
+    return decision if "DECISION" in decision else None
+
+
+def decision_action(decision: dict[str, str]) -> Optional[str]:
+    """
+    IGNORE, MONITOR or TICKET from a parsed decision, tolerating LLM
+    decoration such as "[TICKET]" or "TICKET - sustained errors".
+    None when the DECISION value is none of the three.
+    """
+    match = _ACTION_RE.match(decision.get("DECISION", ""))
+    return match.group(1).upper() if match else None
+
+
+def digest_search_logs(payload: str, query: str = "") -> Optional[dict]:
+    """
+    Digest a search_logs result (Datadog LogsListResponse JSON) into the
+    pieces the investigation summary cache needs:
+
+    - signature: hash of the search query, the sorted sets of services,
+      statuses and message templates, and the log2 bucket of the log
+      count. Equal signatures mean "same errors from the same services
+      again".
+    - fields: report fields that are specific to this occurrence and must
+      be patched into a cached summary (count, time range, hosts).
+
+    Returns None if the payload is not a log listing.
+    """
+    try:
+        logs = json.loads(payload).get("data")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(logs, list):
+        return None
+
+    templates, services, statuses = set(), set(), set()
+    timestamps, hosts = [], set()
+    for log in logs:
+        attributes = (log.get("attributes") if isinstance(log, dict) else None) or {}
+        if attributes.get("message"):
+            templates.add(templatize_message(str(attributes["message"])))
+        if attributes.get("timestamp"):
+            timestamps.append(str(attributes["timestamp"]))
+        if attributes.get("host"):
+            hosts.add(str(attributes["host"]))
+        if attributes.get("service"):
+            services.add(str(attributes["service"]))
+        if attributes.get("status"):
+            statuses.add(str(attributes["status"]))
+
+    shape = [
+        query.strip(),
+        sorted(services),
+        sorted(statuses),
+        sorted(templates),
+        len(logs).bit_length(),
+    ]
+    timestamps.sort()
+    return {
+        "signature": hashlib.sha256(json.dumps(shape).encode()).hexdigest(),
+        "fields": {
+            "error count": str(len(logs)),
+            "time range": (
+                f"{timestamps[0]} to {timestamps[-1]}" if timestamps else "N/A"
+            ),
+            "affected hosts/containers": ", ".join(sorted(hosts)) or "N/A",
+        },
+    }
+
+
+def patch_report_fields(text: str, values: dict[str, str]) -> str:
+    """
+    Replace the value of each "- **Label**: value" field in text whose
+    lowercased label is in values. Continuation lines of a replaced field
+    are dropped.
+    """
+    lines, skipping = [], False
+    for line in text.splitlines():
+        match = _FIELD_RE.match(line)
+        if match:
+            label = match.group("label").strip().lower()
+            skipping = label in values
+            if skipping:
+                line = line[: match.start("value")] + values[label]
+        elif skipping and line.strip():
+            continue
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,69 @@
+"""
+Rule-based decisions for parsed investigation reports.
+
+The decision agent's criteria (see decision_maker's instruction in
+agent.py) are thresholds on error count, services affected and stack
+traces, so they are evaluated here directly. decision_maker is only used
+when the investigation report cannot be parsed.
+"""
+
+from reports import InvestigationReport
+
+# Severity levels map to priorities as in decision_maker's output format
+PRIORITIES = {"LOW": "P3", "MEDIUM": "P2", "HIGH": "P1", "CRITICAL": "P0"}
+
+# Default severity when the investigation did not assess one
+_DEFAULT_SEVERITY = {"IGNORE": "LOW", "MONITOR": "MEDIUM", "TICKET": "HIGH"}
+
+
+def decide(report: InvestigationReport) -> str:
+    """
+    Classify report as IGNORE (< 2 errors), MONITOR (2-4 errors, single
+    service) or TICKET (5+ errors, several services, or stack traces) and
+    return the decision block in decision_maker's output format.
+    """
+    count = report.error_count
+    services = ", ".join(report.services) or "unknown"
+    stack_traces = bool(report.stack_traces)
+
+    if count < 2:
+        decision = "IGNORE"
+        reason = (
+            f"Only {count} error(s) found in {services}, which points to a "
+            "transient spike rather than a sustained issue."
+        )
+    elif count >= 5 or len(report.services) > 1 or stack_traces:
+        decision = "TICKET"
+        evidence = [f"{count} errors found"]
+        if len(report.services) > 1:
+            evidence.append(f"across {len(report.services)} services ({services})")
+        else:
+            evidence.append(f"in {services}")
+        reason = " ".join(evidence) + "."
+        if stack_traces:
+            reason += " Stack traces are present."
+        if report.top_errors:
+            reason += f" Top error: {report.top_errors[0]}"
+    else:
+        decision = "MONITOR"
+        reason = (
+            f"{count} errors found in {services}. Concerning but limited to a "
+            "single service with no stack traces."
+        )
+
+    severity = report.severity or _DEFAULT_SEVERITY[decision]
+    if decision == "IGNORE":
+        action = "None required; re-check only if the alert fires again"
+    elif report.top_errors:
+        action = f"Investigate {services}: {report.top_errors[0]}"
+    else:
+        action = f"Investigate errors in {services}"
+
+    return "\n".join([
+        f"DECISION: {decision}",
+        f"REASON: {reason}",
+        f"SEVERITY: {severity}",
+        f"PRIORITY: {PRIORITIES[severity]}",
+        f"SERVICES_AFFECTED: {services}",
+        f"RECOMMENDED_ACTION: {action}",
+    ])
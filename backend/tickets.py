@@ -0,0 +1,176 @@
+"""
+Azure DevOps work item rendering.
+
+Builds the wit_create_work_item arguments from the parsed decision and
+investigation, with the same fields and HTML layout the ticket agent's
+instruction describes (see ticket_creator in agent.py), so creating a
+ticket needs no Gemini call.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
+
+from jinja2 import Environment
+
+from reports import InvestigationReport
+
+# Matches the mapping in ticket_creator's instruction
+_ADO_PRIORITIES = {"P0": "1", "P1": "1", "P2": "2", "P3": "3"}
+_SEVERITY_PRIORITIES = {"CRITICAL": "1", "HIGH": "1", "MEDIUM": "2", "LOW": "3"}
+
+_TITLE_MAX = 120
+
+_env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+
+_DESCRIPTION_TMPL = _env.from_string("""\
+<h2>🚨 Incident Summary</h2>
+<p><strong>Alert Source:</strong> Datadog Monitor</p>
+<p><strong>Detection Time:</strong> {{ detected_at }}</p>
+<p><strong>Services Affected:</strong> {{ services }}</p>
+<p><strong>Severity:</strong> {{ severity }}</p>
+
+<h2>📊 Investigation Findings</h2>
+<p><strong>Error Count:</strong> {{ error_count }}</p>
+<p><strong>Time Window:</strong> {{ time_range }}</p>
+
+<h3>Error Messages</h3>
+<ul>
+{% for message in errors %}
+  <li>{{ message }}</li>
+{% else %}
+  <li>N/A</li>
+{% endfor %}
+</ul>
+{% if stack_traces %}
+
+<h3>Stack Trace (if available)</h3>
+<pre>{{ stack_traces }}</pre>
+{% endif %}
+
+<h2>🔍 Root Cause Analysis</h2>
+<p>{{ root_cause }}</p>
+
+<h2>📋 Recommended Actions</h2>
+<ol>
+{% for action in actions %}
+  <li>{{ action }}</li>
+{% endfor %}
+</ol>
+
+<h2>🔗 Links</h2>
+<ul>
+  <li><a href="{{ logs_url }}">Datadog Logs</a></li>
+</ul>
+""")
+
+_REPRO_TMPL = _env.from_string("""\
+<h3>How to Reproduce/Investigate</h3>
+<ol>
+  <li>Go to Datadog Logs Explorer</li>
+  <li>Search: {{ query }}</li>
+  <li>Time range: {{ time_range }}</li>
+  <li>Review error patterns and stack traces</li>
+</ol>
+""")
+
+
+def _field(report: InvestigationReport, label: str) -> str:
+    value = report.fields.get(label, "").strip()
+    return value or "N/A"
+
+
+def _split_services(value: str) -> list[str]:
+    return [
+        item.strip()
+        for item in value.split(",")
+        if item.strip() and item.strip().lower() not in ("none", "unknown")
+    ]
+
+
+def alert_epoch_seconds(timestamp: int) -> int:
+    """Datadog alert timestamp in seconds ($DATE is sent in milliseconds)."""
+    return timestamp // 1000 if timestamp > 10**11 else timestamp
+
+
+def _format_alert_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(
+        alert_epoch_seconds(timestamp), timezone.utc
+    ).isoformat()
+
+
+def _logs_url(dd_site: str, query: str) -> str:
+    # datadoghq.com -> app.datadoghq.com; regional sites (us5.datadoghq.com)
+    # already are the app host
+    host = dd_site if dd_site.count(".") > 1 else f"app.{dd_site}"
+    return f"https://{host}/logs?query={quote(query)}"
+
+
+def render_ticket(
+    decision: dict[str, str],
+    investigation: InvestigationReport,
+    project: str,
+    dd_site: str = "datadoghq.com",
+    alert_date: Optional[int] = None,
+) -> dict:
+    """
+    Return wit_create_work_item arguments (project, workItemType, fields)
+    for a TICKET decision, as parsed by reports.parse_decision.
+    alert_date is the Datadog alert timestamp, used as the detection time.
+    """
+    services = investigation.services or _split_services(
+        decision.get("SERVICES_AFFECTED", "")
+    )
+    services_text = ", ".join(services) or "unknown"
+    query = "status:error" + "".join(f" service:{s}" for s in services[:1])
+    time_range = _field(investigation, "time range")
+
+    if investigation.top_errors:
+        summary = investigation.top_errors[0]
+    else:
+        summary = decision.get("RECOMMENDED_ACTION") or "errors detected"
+    title = f"[INCIDENT] {services_text}: {summary}"
+    if len(title) > _TITLE_MAX:
+        title = title[: _TITLE_MAX - 1].rstrip() + "…"
+
+    severity = (
+        decision.get("SEVERITY", "").upper() or investigation.severity or "N/A"
+    )
+    priority = _ADO_PRIORITIES.get(
+        decision.get("PRIORITY", "").upper()[:2],
+        _SEVERITY_PRIORITIES.get(severity, "2"),
+    )
+
+    actions = [decision.get("RECOMMENDED_ACTION") or "Investigate the errors above"]
+    actions.append("Review error patterns and stack traces in Datadog Logs")
+
+    description = _DESCRIPTION_TMPL.render(
+        detected_at=(
+            _format_alert_time(alert_date)
+            if alert_date
+            else time_range.split(" to ")[0]
+        ),
+        services=services_text,
+        severity=severity,
+        error_count=investigation.error_count,
+        time_range=time_range,
+        errors=investigation.top_errors[:3],
+        stack_traces=investigation.stack_traces,
+        root_cause=_field(investigation, "root cause hypothesis"),
+        actions=actions,
+        logs_url=_logs_url(dd_site, query),
+    )
+    repro_steps = _REPRO_TMPL.render(query=query, time_range=time_range)
+
+    tags = ["incident", "datadog", "automated", *services]
+    return {
+        "project": project,
+        "workItemType": "Bug",
+        "fields": [
+            {"name": "System.Title", "value": title},
+            {"name": "System.Description", "value": description},
+            {"name": "Microsoft.VSTS.Common.Priority", "value": priority},
+            {"name": "System.Tags", "value": "; ".join(tags)},
+            {"name": "Microsoft.VSTS.TCM.ReproSteps", "value": repro_steps},
+        ],
+    }